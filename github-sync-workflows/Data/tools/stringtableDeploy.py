@@ -6,27 +6,42 @@ Updated deploy script that:
 - reads repo from GITHUB_REPOSITORY
 - reads GH token from GH_TOKEN
 - optionally uses TRANSLATION_ISSUE env var (issue number)
-- searches for an issue titled "Translations" if TRANSLATION_ISSUE is not provided
-- generates the markdown report by calling tools/stringtableDiag.py --markdown
-- updates the issue body only when different (adds a timestamp footer)
+- searches for an issue titled "Translations" if TRANSLATION_ISSUE is not provided,
+  remembering the result in TRANSLATION_ISSUE_CACHE (a small JSON state file)
+- generates the markdown report in-process through the tools/stringtableDiag.py API
+- updates the issue body only when the report changed, tracked by a digest embedded
+  in the issue as an HTML comment (adds a timestamp footer)
 - logs sizes and actions for easier debugging
 """
 
 import os
+import re
 import sys
+import hashlib
+import json
+import threading
 import traceback
-import subprocess as sp
 from datetime import datetime
 
 # PyGithub modern auth
 from github import Github, Auth
 
+# Lives next to this script in tools/
+import stringtableDiag
+
 TRANSLATIONBODY = """**[Translation Guide](https://ace3.acemod.org/wiki/development/how-to-translate-ace3.html)**
 {}
 """
 
+TRANSLATION_TITLE = "Translations"
+
+DIGEST_PATTERN = re.compile(r"<!-- translation-report-digest: ([0-9a-f]{64}) -->")
+
+# The issue cache file can be shared by several repos updated in parallel (fleet mode)
+ISSUE_CACHE_LOCK = threading.Lock()
+
 def get_repo():
-    """Authenticate and return the GitHub repository object."""
+    """Authenticate and return the GitHub client and repository object."""
     try:
         token = os.environ["GH_TOKEN"]
     except KeyError:
@@ -42,107 +57,201 @@ def get_repo():
         github = Github(auth=Auth.Token(token))
         repo = github.get_repo(repo_path)
         print(f"✅ Connected to repository: {repo_path}")
-        return repo
+        return github, repo
     except Exception:
         print("❌ Could not connect to GitHub repository.")
         print(traceback.format_exc())
         sys.exit(1)
 
 
-def find_translation_issue(repo):
+def is_translation_issue(issue):
+    """Check that an issue is an open, real issue (not a PR) titled 'Translations'."""
+    return issue.state == "open" \
+        and issue.pull_request is None \
+        and (issue.title or "").strip().lower() == TRANSLATION_TITLE.lower()
+
+
+def load_cached_issue_number(repo):
+    """Return the translation issue number remembered for this repo, or None."""
+    cache_path = os.environ.get("TRANSLATION_ISSUE_CACHE", "").strip()
+    if not cache_path or not os.path.isfile(cache_path):
+        return None
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            return int(json.load(f)[repo.full_name])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def save_cached_issue_number(repo, issue_number):
+    """Remember the resolved translation issue number for the next run."""
+    cache_path = os.environ.get("TRANSLATION_ISSUE_CACHE", "").strip()
+    if not cache_path:
+        return
+    with ISSUE_CACHE_LOCK:
+        data = {}
+        try:
+            with open(cache_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            pass
+        data[repo.full_name] = issue_number
+        try:
+            os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+            with open(cache_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2)
+        except OSError:
+            print(f"⚠️ Could not write translation issue cache: {cache_path}")
+
+
+def search_translation_issue(github, repo):
+    """Resolve the translation issue with a single search query, returns the issue or None."""
+    query = f'repo:{repo.full_name} is:issue is:open in:title "{TRANSLATION_TITLE}"'
+    label = os.environ.get("TRANSLATION_LABEL", "").strip()
+    if label:
+        query += f' label:"{label}"'
+
+    # Search is fuzzy (e.g. "Add Polish translations" matches too), so compare the exact title
+    # through all results; they are bounded by the number of matching open issues
+    for issue in github.search_issues(query):
+        if is_translation_issue(issue):
+            return issue
+    return None
+
+
+def scan_translation_issue(repo):
+    """Scan all open issues for the translation issue, returns the issue or None."""
+    try:
+        for issue in repo.get_issues(state="open"):
+            if is_translation_issue(issue):
+                return issue
+    except Exception:
+        print("⚠️ Error while scanning open issues (continuing to soft-exit if none found).")
+        print(traceback.format_exc())
+    return None
+
+
+def find_translation_issue(github, repo, issue_number=None, save_cache=True):
     """
-    Determine which issue to update.
-    1) If TRANSLATION_ISSUE env var exists and is a number, use it.
-    2) Otherwise search open issues for one titled 'Translations' (case-insensitive).
-    3) If none found, exit gracefully (soft success).
+    Determine which issue to update, returns the issue or None if the repo has none.
+    A resolved issue number is remembered in TRANSLATION_ISSUE_CACHE unless save_cache is False (dry runs).
+    1) If an issue number is given (TRANSLATION_ISSUE env var in main), use it.
+    2) Otherwise use the issue number cached in TRANSLATION_ISSUE_CACHE, re-checked with one GET.
+    3) Otherwise resolve it with a single search query (title, optionally TRANSLATION_LABEL).
+    4) Only if the search fails, scan open issues for one titled 'Translations' (case-insensitive).
     """
-    env_val = os.environ.get("TRANSLATION_ISSUE", "").strip()
-    if env_val:
+    if issue_number:
         try:
-            issue_number = int(env_val)
-            issue = repo.get_issue(issue_number)
-            print(f"✅ Using translation issue #{issue_number} (from TRANSLATION_ISSUE env).")
+            issue = repo.get_issue(int(issue_number))
+            print(f"✅ Using translation issue #{issue.number} (from TRANSLATION_ISSUE env).")
             print(f"    {issue.html_url}")
             return issue
         except Exception:
-            print(f"⚠️ TRANSLATION_ISSUE provided but invalid or not found: '{env_val}'")
+            print(f"⚠️ TRANSLATION_ISSUE provided but invalid or not found: '{issue_number}'")
             # fall through to search
 
-    print("ℹ️ No valid TRANSLATION_ISSUE env var found. Searching for an open issue titled 'Translations'...")
-    try:
-        issues = repo.get_issues(state="open")
-        for issue in issues:
-            if issue.title and issue.title.strip().lower() == "translations":
-                print(f"✅ Found translation issue #{issue.number} by title.")
+    cached_number = load_cached_issue_number(repo)
+    if cached_number is not None:
+        try:
+            issue = repo.get_issue(cached_number)
+            if is_translation_issue(issue):
+                print(f"✅ Using translation issue #{cached_number} (from cache).")
                 print(f"    {issue.html_url}")
                 return issue
+            print(f"⚠️ Cached translation issue #{cached_number} is no longer valid.")
+        except Exception:
+            print(f"⚠️ Cached translation issue #{cached_number} not found.")
+
+    print(f"ℹ️ Searching {repo.full_name} for an open issue titled 'Translations'...")
+    try:
+        issue = search_translation_issue(github, repo)
+        source = "search"
     except Exception:
-        print("⚠️ Error while searching for issues (continuing to soft-exit if none found).")
+        # Only scan all open issues when the search itself failed, an empty result is final
+        print("⚠️ Error while searching for issues (falling back to scanning open issues).")
         print(traceback.format_exc())
+        issue = scan_translation_issue(repo)
+        source = "title"
 
-    print("⚠️ No 'Translations' issue found. Exiting gracefully (no failure).")
-    sys.exit(0)
+    if issue is not None:
+        print(f"✅ Found translation issue #{issue.number} by {source}.")
+        print(f"    {issue.html_url}")
+        if save_cache:
+            save_cached_issue_number(repo, issue.number)
+    return issue
 
 
 def generate_translation_report():
-    """Run the diagnostic tool and return its markdown output."""
-    diag_script = os.path.join(os.path.dirname(os.path.realpath(__file__)), "stringtableDiag.py")
-    if not os.path.isfile(diag_script):
-        print("❌ Diagnostic script not found at tools/stringtableDiag.py")
-        sys.exit(1)
-
+    """Run the diagnostic tool in-process and return its structured report."""
     try:
-        # Use text=True to get str directly (py3.7+)
-        diag_output = sp.check_output(["python3", diag_script, "--markdown"], text=True, stderr=sp.STDOUT)
-        return diag_output
-    except sp.CalledProcessError as e:
-        print("❌ stringtableDiag.py failed:")
-        # print command output for debugging
-        print(e.output)
-        sys.exit(1)
+        report = stringtableDiag.build_report(cachepath=os.environ.get("STRINGTABLE_CACHE") or None)
     except Exception:
         print("❌ Unexpected error running stringtableDiag.py.")
         print(traceback.format_exc())
         sys.exit(1)
 
+    incomplete = [language for language in report.languages if not report.is_complete(language)]
+    print(f"ℹ️ {report.keysum} keys in {len(report.languages)} languages, {len(incomplete)} incomplete.")
+    for language in incomplete:
+        print(f"    {language}: {report.missing_entries(language)} missing")
 
-def update_issue(issue, body):
-    """Update the translation issue with the latest report, with logging & timestamp."""
-    try:
-        timestamp = datetime.utcnow().strftime("%Y-%m-%d %H:%M UTC")
-        new_body = TRANSLATIONBODY.format(body) + f"\n\n_Last updated automatically: {timestamp}_"
+    return report
 
-        current_body = issue.body or ""
 
-        # Log sizes
-        print(f"ℹ️ Current issue body length: {len(current_body)} characters")
-        print(f"ℹ️ New issue body length:     {len(new_body)} characters")
+def render_translation_report(report):
+    """Render the report as the markdown body of the translation issue."""
+    return stringtableDiag.render_markdown(report)
 
-        # If identical, skip
-        if new_body.strip() == current_body.strip():
-            print("ℹ️ Issue body is already up to date — no changes made.")
-            return
 
-        print(f"📝 Updating issue #{issue.number} …")
-        issue.edit(body=new_body)
-        print(f"✅ Successfully updated issue #{issue.number}")
+def report_digest(body):
+    """Digest of the report content, without the timestamp footer."""
+    return hashlib.sha256(TRANSLATIONBODY.format(body).strip().encode("utf-8")).hexdigest()
 
-    except Exception:
-        print("❌ Failed to update issue.")
-        print(traceback.format_exc())
-        sys.exit(1)
+
+def update_issue(issue, body):
+    """Update the translation issue with the latest report, with logging & timestamp.
+    Returns True if the issue was edited, False if it was already up to date. Raises if the edit fails."""
+    digest = report_digest(body)
+    current_body = issue.body or ""
+
+    # The digest of the last report is embedded in the issue, skip before building anything new
+    match = DIGEST_PATTERN.search(current_body)
+    if match and match.group(1) == digest:
+        print(f"ℹ️ Report digest unchanged ({digest[:12]}) — no changes made.")
+        return False
+
+    timestamp = datetime.utcnow().strftime("%Y-%m-%d %H:%M UTC")
+    new_body = TRANSLATIONBODY.format(body) + f"\n\n_Last updated automatically: {timestamp}_" \
+        + f"\n\n<!-- translation-report-digest: {digest} -->"
+
+    # Log sizes
+    print(f"ℹ️ Current issue body length: {len(current_body)} characters")
+    print(f"ℹ️ New issue body length:     {len(new_body)} characters")
+
+    print(f"📝 Updating issue #{issue.number} …")
+    issue.edit(body=new_body)
+    print(f"✅ Successfully updated issue #{issue.number}")
+    return True
 
 
 def main():
-    repo = get_repo()
-    issue = find_translation_issue(repo)
-    # If find_translation_issue returns, we have an issue object.
+    github, repo = get_repo()
+    issue = find_translation_issue(github, repo, os.environ.get("TRANSLATION_ISSUE", "").strip() or None)
+    if issue is None:
+        print("⚠️ No 'Translations' issue found. Exiting gracefully (no failure).")
+        sys.exit(0)
 
     print("\n🧾 Generating translation report...")
-    diag_body = generate_translation_report()
+    report = generate_translation_report()
+    diag_body = render_translation_report(report)
 
     print("\n✏️ Updating translation issue...")
-    update_issue(issue, diag_body)
+    try:
+        update_issue(issue, diag_body)
+    except Exception:
+        print("❌ Failed to update issue.")
+        print(traceback.format_exc())
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -1,123 +1,395 @@
 #!/usr/bin/env python3
 
 import os
-import sys
+import argparse
+import csv
+import functools
+import hashlib
+import json
+from concurrent.futures import ProcessPoolExecutor
 
-from xml.dom import minidom
+import xml.etree.ElementTree as ET
 
 # STRINGTABLE DIAG TOOL
 # Author: KoffeinFlummi
 # ---------------------
 # Checks for missing translations and all that jazz.
 
-def get_all_languages(projectpath):
-    """ Checks what languages exist in the repo. """
-    languages = []
+class PresenceMatrix:
+    """ Key x language presence matrix of a single stringtable.
+    Every language is stored as one bit mask over the keys (bit i set = key i has that language),
+    so 100k keys x 20 languages only take a few hundred kilobytes. """
+    __slots__ = ("keys", "presence")
 
-    for module in os.listdir(projectpath):
-        if module[0] == ".":
-            continue
+    def __init__(self, keys=None, presence=None):
+        self.keys = keys or []         # key IDs, in file order
+        self.presence = presence or {} # language -> bit mask, in order of appearance
 
-        stringtablepath = os.path.join(projectpath, module, "stringtable.xml")
-        try:
-            xmldoc = minidom.parse(stringtablepath)
-        except:
-            continue
+    def __len__(self):
+        return len(self.keys)
+
+    @property
+    def languages(self):
+        return list(self.presence)
+
+    def full_mask(self):
+        return (1 << len(self.keys)) - 1
+
+    def count(self, language):
+        """ Returns the number of keys that have the given language. """
+        return bin(self.presence.get(language, 0)).count("1")
+
+    def missing_mask(self, language):
+        return self.full_mask() & ~self.presence.get(language, 0)
+
+    def keys_of(self, mask):
+        """ Returns the key IDs of all bits set in the given mask. """
+        bits = bin(mask)[:1:-1]
+        return [self.keys[i] for i, bit in enumerate(bits) if bit == "1"]
+
+    def missing_keys(self, language):
+        """ Returns the IDs of all keys that don't have the given language. """
+        return self.keys_of(self.missing_mask(language))
+
+    def keys_missing_in(self, languages, minimum=1):
+        """ Returns (key ID, missing languages) for all keys missing in at least `minimum` of the given languages. """
+        minimum = max(minimum, 1)
+        missing = [self.missing_mask(language) for language in languages]
+
+        # atLeast[n] has a bit set for every key that is missing in at least n of the languages seen so far
+        atLeast = [self.full_mask()] + [0] * minimum
+        for mask in missing:
+            for n in range(minimum, 0, -1):
+                atLeast[n] |= atLeast[n - 1] & mask
+
+        missingBits = [(language, bin(mask)[:1:-1]) for language, mask in zip(languages, missing)]
+        bits = bin(atLeast[minimum])[:1:-1]
+        return [(self.keys[i], [language for language, languageBits in missingBits if i < len(languageBits) and languageBits[i] == "1"])
+            for i, bit in enumerate(bits) if bit == "1"]
+
+def parse_stringtable(stringtablepath):
+    """ Reads a stringtable in a single streaming pass.
+    Returns its PresenceMatrix, or None if the file can't be parsed. """
+    keys = []
+    present = {} # language -> bytearray with one bit per key
+    inKey = False
 
-        keys = xmldoc.getElementsByTagName("Key")
-        for key in keys:
-            for child in key.childNodes:
-                try:
-                    if not child.tagName in languages:
-                        languages.append(child.tagName)
-                except:
+    try:
+        for event, element in ET.iterparse(stringtablepath, events=("start", "end")):
+            if element.tag == "Key":
+                if event == "start":
+                    inKey = True
                     continue
+                inKey = False
+                index = len(keys)
+                keys.append(element.get("ID", ""))
+                for child in element:
+                    bits = present.get(child.tag)
+                    if bits is None:
+                        bits = present[child.tag] = bytearray()
+                    if len(bits) <= index >> 3:
+                        bits.extend(bytes((index >> 3) + 1 - len(bits)))
+                    bits[index >> 3] |= 1 << (index & 7)
+                element.clear()
+            elif event == "end" and not inKey:
+                # Everything outside of a key is just a container, free it once it's done
+                element.clear()
+    except (OSError, ET.ParseError):
+        return None
+
+    return PresenceMatrix(keys, {language: int.from_bytes(bits, "little") for language, bits in present.items()})
+
+def check_module(projectpath, module):
+    """ Checks the given module, returns its PresenceMatrix (empty if there is no stringtable). """
+    stringtablepath = os.path.join(projectpath, module, "stringtable.xml")
+    if not os.path.isfile(stringtablepath):
+        return PresenceMatrix()
+
+    matrix = parse_stringtable(stringtablepath)
+    if matrix is None:
+        return PresenceMatrix()
+
+    return matrix
+
+def find_missing_keys(results, languages, language=None, module=None, minimum=1):
+    """ Returns (module, key ID, missing languages) for the missing translations matching the query.
+    With a language only keys missing that language are returned, otherwise keys missing in at
+    least `minimum` of all languages. """
+    rows = []
+    for name, matrix in results:
+        if module and name.lower() != module.lower():
+            continue
+        if language:
+            rows.extend((name, key, [language]) for key in matrix.missing_keys(language))
+        else:
+            rows.extend((name, key, missingLanguages) for key, missingLanguages in matrix.keys_missing_in(languages, minimum))
+    return rows
+
+def export_missing_keys(rows, exportpath):
+    """ Writes the result of find_missing_keys as .csv or .json, depending on the file extension. """
+    if exportpath.lower().endswith(".csv"):
+        with open(exportpath, "w", encoding="utf-8", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(["module", "key", "missing"])
+            for module, key, missingLanguages in rows:
+                writer.writerow([module, key, ";".join(missingLanguages)])
+    else:
+        with open(exportpath, "w", encoding="utf-8") as file:
+            json.dump([{"module": module, "key": key, "missing": missingLanguages} for module, key, missingLanguages in rows], file, indent=2)
+
+class Totals:
+    """ Mergeable result of one or more modules.
+    Merging is associative, so partial results can be combined in any grouping as long as
+    the module order is kept. """
+    def __init__(self, keysum=0, localized=None, missing=None, modules=None):
+        self.keysum = keysum
+        self.localized = localized or {} # language -> number of entries, in order of appearance
+        self.missing = missing or {}     # language -> modules with missing entries
+        self.modules = modules or []     # modules with at least one key
+
+    @classmethod
+    def from_module(cls, module, matrix):
+        keynumber = len(matrix)
+        if keynumber == 0:
+            return cls()
+        localized = {language: matrix.count(language) for language in matrix.languages}
+        missing = {language: [module] for language, count in localized.items() if count < keynumber}
+        return cls(keynumber, dict(localized), missing, [module])
 
-    return languages
+    def merge(self, other):
+        languages = list(self.localized) + [language for language in other.localized if language not in self.localized]
+        localized = {}
+        missing = {}
+        for language in languages:
+            localized[language] = self.localized.get(language, 0) + other.localized.get(language, 0)
+            # A module that doesn't know a language at all is missing all of its entries
+            missing[language] = (self.missing.get(language, []) if language in self.localized else self.modules) \
+                + (other.missing.get(language, []) if language in other.localized else other.modules)
+        return Totals(self.keysum + other.keysum, localized, missing, self.modules + other.modules)
 
-def check_module(projectpath, module, languages):
-    """ Checks the given module for all the different languages. """
-    localized = []
+def analyze_module(projectpath, module):
+    """ Worker entry point, returns the compact partial result of a single module. """
+    return module, check_module(projectpath, module)
 
+def get_tool_version():
+    """ Cached results are only valid for the exact version of this script that created them. """
+    with open(os.path.realpath(__file__), "rb") as file:
+        return hashlib.sha1(file.read()).hexdigest()
+
+def hash_module(projectpath, module):
+    """ Returns the content hash of the module's stringtable, or None if it has none. """
     stringtablepath = os.path.join(projectpath, module, "stringtable.xml")
     try:
-        xmldoc = minidom.parse(stringtablepath)
-    except:
-        return 0, localized
+        with open(stringtablepath, "rb") as file:
+            return hashlib.sha1(file.read()).hexdigest()
+    except OSError:
+        return None
 
-    keynumber = len(xmldoc.getElementsByTagName("Key"))
+class ResultCache:
+    """ Persistent per-module parse results, keyed by the content hash of the stringtable. """
+    def __init__(self, cachepath=None):
+        self.cachepath = cachepath
+        self.version = get_tool_version()
+        self.modules = {}
+        if cachepath and os.path.isfile(cachepath):
+            try:
+                with open(cachepath, "r", encoding="utf-8") as file:
+                    data = json.load(file)
+                if data.get("version") == self.version:
+                    self.modules = data.get("modules", {})
+            except (OSError, ValueError):
+                pass # unreadable cache, just parse everything again
 
-    for language in languages:
-        localized.append(len(xmldoc.getElementsByTagName(language)))
+    def lookup(self, module, digest):
+        entry = self.modules.get(module)
+        if entry is None or entry["hash"] != digest:
+            return None
+        return PresenceMatrix(entry["keys"], {language: int(mask, 16) for language, mask in entry["presence"]})
 
-    return keynumber, localized
+    def store(self, module, digest, matrix):
+        self.modules[module] = {
+            "hash": digest,
+            "keys": matrix.keys,
+            # list of pairs, to keep the language order
+            "presence": [[language, format(mask, "x")] for language, mask in matrix.presence.items()],
+        }
 
-def main():
+    def save(self, modules):
+        if not self.cachepath:
+            return
+        self.modules = {module: entry for module, entry in self.modules.items() if module in modules}
+        directory = os.path.dirname(self.cachepath)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.cachepath, "w", encoding="utf-8") as file:
+            json.dump({"version": self.version, "modules": self.modules}, file)
+
+def analyze_modules(projectpath, jobs=None, cachepath=None):
+    """ Analyzes all modules, in parallel if possible. Results are returned in module order.
+    With a cache file, only stringtables that changed since the last run are parsed. """
+    modules = [module for module in os.listdir(projectpath) if module[0] != "."]
+    worker = functools.partial(analyze_module, projectpath)
+
+    cache = ResultCache(cachepath)
+    digests = {}
+    matrices = {}
+    for module in modules:
+        digests[module] = hash_module(projectpath, module)
+        if digests[module] is None:
+            matrices[module] = PresenceMatrix()
+        elif cachepath:
+            matrix = cache.lookup(module, digests[module])
+            if matrix is not None:
+                matrices[module] = matrix
+    changed = [module for module in modules if module not in matrices]
+
+    results = None
+    jobs = jobs or os.cpu_count() or 1
+    if jobs > 1 and len(changed) > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=min(jobs, len(changed))) as executor:
+                results = list(executor.map(worker, changed))
+        except (OSError, NotImplementedError):
+            pass # no multiprocessing support on this platform, fall back to a serial run
+    if results is None:
+        results = [worker(module) for module in changed]
+
+    for module, matrix in results:
+        matrices[module] = matrix
+        cache.store(module, digests[module], matrix)
+    cache.save(modules)
+
+    return [(module, matrices[module]) for module in modules]
+
+def merge_results(results):
+    return functools.reduce(Totals.merge, (Totals.from_module(*result) for result in results), Totals())
+
+def list_missing_keys(results, languages, args):
+    """ Prints (and optionally exports) the keys with missing translations. """
+    rows = find_missing_keys(results, languages, args.missing, args.module, args.min_missing or 1)
+    for module, key, missingLanguages in rows:
+        print("%s %s (%s)" % ((module + ":").ljust(12), key, ", ".join(missingLanguages)))
+    print("\n%i key(s) with missing translations." % len(rows))
+
+    if args.export:
+        export_missing_keys(rows, args.export)
+        print("Exported to %s" % args.export)
+
+class Report:
+    """ Structured result of a stringtable analysis, see build_report. """
+    def __init__(self, results, totals):
+        self.results = results              # (module, PresenceMatrix) in module order
+        self.languages = list(totals.localized)
+        self.keysum = totals.keysum
+        self.localized = totals.localized   # language -> number of localized keys
+        self.missing = totals.missing       # language -> modules with missing entries
+
+    def missing_entries(self, language):
+        return self.keysum - self.localized[language]
+
+    def is_complete(self, language):
+        return self.localized[language] == self.keysum
+
+def get_projectpath():
+    """ Returns the addons folder of the project this script lives in. """
     scriptpath = os.path.realpath(__file__)
     projectpath = os.path.dirname(os.path.dirname(scriptpath))
-    projectpath = os.path.join(projectpath, "addons")
+    return os.path.join(projectpath, "addons")
 
-    if "--markdown" not in sys.argv:
-        print("#########################")
-        print("# Stringtable Diag Tool #")
-        print("#########################")
+def build_report(projectpath=None, jobs=None, cachepath=None):
+    """ Analyzes all stringtables of the project and returns a Report. """
+    results = analyze_modules(projectpath or get_projectpath(), jobs, cachepath)
+    return Report(results, merge_results(results))
 
-    languages = get_all_languages(projectpath)
+def render_markdown(report):
+    """ Returns the markdown summary table of the report. """
+    lines = []
+    lines.append("Total number of keys: %i\n" % (report.keysum))
 
-    if "--markdown" not in sys.argv:
-        print("\nLanguages present in the repo:")
-        print(", ".join(languages))
+    lines.append("| Language | Missing Entries | Relevant Modules | % done |")
+    lines.append("|----------|----------------:|------------------|--------|")
 
-    keysum = 0
-    localizedsum = list(map(lambda x: 0, languages))
-    missing = list(map(lambda x: [], languages))
+    for language in report.languages:
+        if report.is_complete(language):
+            lines.append("| {} | 0 | - | 100% |".format(language))
+        else:
+            lines.append("| {} | {} | {} | {}% |".format(
+                language,
+                report.missing_entries(language),
+                ", ".join(report.missing[language]),
+                round(100 * report.localized[language] / report.keysum)))
 
-    for module in os.listdir(projectpath):
-        keynumber, localized = check_module(projectpath, module, languages)
+    return "\n".join(lines) + "\n"
 
-        if keynumber == 0:
+def render_console(report):
+    """ Returns the full console report, per module details followed by the markdown summary. """
+    lines = []
+    lines.append("#########################")
+    lines.append("# Stringtable Diag Tool #")
+    lines.append("#########################")
+
+    lines.append("\nLanguages present in the repo:")
+    lines.append(", ".join(report.languages))
+
+    for module, matrix in report.results:
+        if len(matrix) == 0:
             continue
 
-        if "--markdown" not in sys.argv:
-            print("\n# " + module)
+        lines.append("\n# " + module)
+        for language in report.languages:
+            lines.append("  %s %s / %i" % ((language+":").ljust(10), str(matrix.count(language)).ljust(3), len(matrix)))
 
-        keysum += keynumber
-        for i in range(len(localized)):
-            if "--markdown" not in sys.argv:
-                print("  %s %s / %i" % ((languages[i]+":").ljust(10), str(localized[i]).ljust(3), keynumber))
-            localizedsum[i] += localized[i]
-            if localized[i] < keynumber:
-                missing[i].append(module)
+    lines.append("\n###########")
+    lines.append("# RESULTS #")
+    lines.append("###########")
+    lines.append("\nTotal number of keys: %i\n" % (report.keysum))
 
-    if "--markdown" not in sys.argv:
-        print("\n###########")
-        print("# RESULTS #")
-        print("###########")
-        print("\nTotal number of keys: %i\n" % (keysum))
+    for language in report.languages:
+        if report.is_complete(language):
+            lines.append("%s No missing stringtable entries." % ((language + ":").ljust(12)))
+        else:
+            lines.append("%s %s missing stringtable entry/entries. (%s)" % (
+                (language + ":").ljust(12), str(report.missing_entries(language)).rjust(4), ", ".join(report.missing[language])))
 
-        for i in range(len(languages)):
-            if localizedsum[i] == keysum:
-                print("%s No missing stringtable entries." % ((languages[i] + ":").ljust(12)))
-            else:
-                print("%s %s missing stringtable entry/entries." % ((languages[i] + ":").ljust(12), str(keysum - localizedsum[i]).rjust(4)), end="")
-                print(" ("+", ".join(missing[i])+")")
+    lines.append("\n\n### MARKDOWN ###\n")
 
-        print("\n\n### MARKDOWN ###\n")
+    return "\n".join(lines) + "\n" + render_markdown(report)
 
-    print("Total number of keys: %i\n" % (keysum))
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--markdown', help='only print the markdown report', action='store_true')
+    parser.add_argument('-j', '--jobs', help='number of modules analyzed in parallel (default: number of CPUs)', type=int, default=None)
+    parser.add_argument('--cache', metavar='FILE', help='reuse the results of unchanged stringtables from this file (default: $STRINGTABLE_CACHE)',
+        default=os.environ.get("STRINGTABLE_CACHE") or None)
+    parser.add_argument('--missing', metavar='LANGUAGE', help='list the keys missing the given language')
+    parser.add_argument('--min-missing', metavar='N', help='list the keys missing in at least N languages', type=int, default=None)
+    parser.add_argument('-m', '--module', help='only list missing keys of the given module (alone: keys missing in any language)', default=None)
+    parser.add_argument('--export', metavar='FILE', help='write the listed missing keys to a .json or .csv file')
+    args = parser.parse_args()
 
-    print("| Language | Missing Entries | Relevant Modules | % done |")
-    print("|----------|----------------:|------------------|--------|")
+    if args.min_missing is not None and args.min_missing < 1:
+        parser.error('--min-missing must be at least 1')
 
-    for i, language in enumerate(languages):
-        if localizedsum[i] == keysum:
-            print("| {} | 0 | - | 100% |".format(language))
-        else:
-            print("| {} | {} | {} | {}% |".format(
-                language,
-                keysum - localizedsum[i],
-                ", ".join(missing[i]),
-                round(100 * localizedsum[i] / keysum)))
+    if args.missing is not None or args.min_missing is not None or args.module is not None or args.export:
+        results = analyze_modules(get_projectpath(), args.jobs, args.cache)
+        languages = list(merge_results(results).localized)
+        if args.module is not None:
+            modules = [name for name, matrix in results]
+            if args.module.lower() not in (name.lower() for name in modules):
+                parser.error('unknown module %s (available: %s)' % (args.module, ", ".join(modules)))
+        if args.missing is not None:
+            match = [language for language in languages if language.lower() == args.missing.lower()]
+            if not match:
+                parser.error('unknown language %s (available: %s)' % (args.missing, ", ".join(languages)))
+            args.missing = match[0]
+        return list_missing_keys(results, languages, args)
+
+    report = build_report(jobs=args.jobs, cachepath=args.cache)
+
+    if args.markdown:
+        print(render_markdown(report), end="")
+    else:
+        print(render_console(report), end="")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
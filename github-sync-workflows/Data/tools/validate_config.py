@@ -6,6 +6,19 @@ import re
 import ntpath
 import sys
 import argparse
+import io
+import time
+import select
+import struct
+import ctypes
+import ctypes.util
+import errno
+import hashlib
+import json
+from collections import namedtuple
+from contextlib import redirect_stdout
+
+CONFIG_PATTERNS = ['*.cpp', '*.hpp', '*.rvmat', '*.cfg']
 
 def check_config_style(filepath):
     bad_count_file = 0
@@ -145,43 +158,566 @@ def check_config_style(filepath):
 
     return bad_count_file
 
-def main():
+# =============================================================================
+#  Class index
+# =============================================================================
 
-    print("Validating Config Style")
+# Bump this whenever the symbol table format changes, so old cache files are ignored
+SYMBOL_TABLE_VERSION = 2
 
-    sqf_list = []
+reConfigToken = re.compile(r"""
+    (?P<directive>^[ \t]*\#(?:[^\n\\]|\\.)*)
+  | (?P<space>\n|[ \t\r\f\v]+)
+  | (?P<comment>//[^\n]*|/\*.*?(?:\*/|\Z))
+  | (?P<string>"(?:[^"]|"")*"|'[^'\n]*')
+  | (?P<name>[A-Za-z_]\w*(?:\((?:[^()\n]|\((?:[^()\n]|\((?:[^()\n]|\([^()\n]*\))*\))*\))*\))?)
+  | (?P<punct>[{}:;])
+  | (?P<other>[^\s{}:;"'/\w\#]+|.)
+""", re.S | re.M | re.X)
+reInclude = re.compile(r'^\s*#\s*include\s*["<]([^">]+)[">]')
+reConditionalStart = re.compile(r'^\s*#\s*if')
+reConditionalEnd = re.compile(r'^\s*#\s*endif')
+# Class names like ADDON or GVAR(foo) are macros that expand differently in every addon
+reMacroName = re.compile(r'^[A-Z0-9_]+(\(.*\))?$|\(')
+
+# Scope of a class body whose header couldn't be parsed, its children are kept apart from everything else
+OPAQUE_SCOPE = '<unparsed class at line {0}>'
+
+ClassEntry = namedtuple('ClassEntry', ['path', 'base', 'kind', 'filepath', 'line', 'addon', 'conditional'])
+
+def parse_config_classes(content):
+    """ Builds the symbol table of a config file: every class with its scope, base class and line,
+    and every include together with the class scope it is included in. """
+    classes = []
+    includes = []
+
+    scope = [] # class names for class bodies, OPAQUE_SCOPE for unparsed class headers, None for other braces (arrays)
+    conditional = 0
+    pending = [] # tokens after the class/delete keyword
+    lineNumber = 1
+
+    for match in reConfigToken.finditer(content):
+        kind = match.lastgroup
+        token = match.group()
+        if kind == 'space' or kind == 'comment':
+            lineNumber += token.count('\n')
+            continue
+        if kind == 'directive':
+            include = reInclude.match(token)
+            if include:
+                includes.append([[name for name in scope if name is not None], include.group(1), lineNumber])
+            elif reConditionalStart.match(token):
+                conditional += 1
+            elif reConditionalEnd.match(token) and conditional > 0:
+                conditional -= 1
+            lineNumber += token.count('\n')
+            continue
+
+        if pending and pending[0] == 'unparsed':
+            # Skip the rest of a class header the tokenizer can't follow (e.g. deeply nested macro arguments)
+            if token == '{':
+                scope.append(OPAQUE_SCOPE.format(pending[1]))
+            if token in ('{', ';', '}'):
+                pending = []
+            if token != '}':
+                lineNumber += token.count('\n')
+                continue
+
+        if pending:
+            # pending is [keyword, line, name, ':', base]
+            if kind == 'name' and len(pending) in (2, 4):
+                pending.append(token)
+                continue
+            if token == ':' and len(pending) == 3 and pending[0] == 'class':
+                pending.append(token)
+                continue
+            if token in ('{', ';') and len(pending) in (3, 5):
+                path = [name for name in scope if name is not None]
+                base = pending[4] if len(pending) == 5 else None
+                if pending[0] == 'delete':
+                    kind_of_class = 'delete'
+                elif token == '{':
+                    kind_of_class = 'class'
+                else:
+                    kind_of_class = 'declaration'
+                classes.append([path, pending[2], base, kind_of_class, pending[1], conditional > 0])
+                if token == '{':
+                    scope.append(pending[2])
+                pending = []
+                continue
+            if pending[0] == 'class' and token == '{':
+                scope.append(OPAQUE_SCOPE.format(pending[1]))
+                pending = []
+                continue
+            if pending[0] == 'class' and token not in (';', '}'):
+                pending = ['unparsed', pending[1]]
+                lineNumber += token.count('\n')
+                continue
+            pending = []
+
+        if kind == 'name' and token in ('class', 'delete'):
+            pending = [token, lineNumber]
+        elif token == '{':
+            scope.append(None)
+        elif token == '}':
+            if scope:
+                scope.pop()
+        lineNumber += token.count('\n')
+
+    return {'classes': classes, 'includes': includes}
+
+class SymbolCache:
+    """ Keeps the symbol table of every parsed file, keyed by the hash of its content.
+    Only files whose content changed are parsed again. """
+    def __init__(self, cachepath=None):
+        self.cachepath = cachepath
+        self.files = {}
+        self.verified = set()
+        self.parsed = 0
+        if cachepath and os.path.isfile(cachepath):
+            try:
+                with open(cachepath, 'r', encoding='utf-8') as file:
+                    data = json.load(file)
+                if data.get('version') == SYMBOL_TABLE_VERSION:
+                    self.files = data.get('files', {})
+            except (OSError, ValueError):
+                print("WARNING: Ignoring unreadable symbol cache {0}".format(cachepath))
+
+    def invalidate(self, filepaths):
+        self.verified.difference_update(os.path.normpath(filepath) for filepath in filepaths)
+
+    def get(self, filepath):
+        """ Returns the symbol table of the given file, or None if it can not be read. """
+        filepath = os.path.normpath(filepath)
+        entry = self.files.get(filepath)
+        if entry is not None and filepath in self.verified:
+            return entry['table']
+        try:
+            with open(filepath, 'rb') as file:
+                data = file.read()
+        except OSError:
+            self.files.pop(filepath, None)
+            return None
+        digest = hashlib.sha1(data).hexdigest()
+        if entry is None or entry['hash'] != digest:
+            entry = {'hash': digest, 'table': parse_config_classes(data.decode('utf-8', errors='ignore'))}
+            self.files[filepath] = entry
+            self.parsed += 1
+        self.verified.add(filepath)
+        return entry['table']
+
+    def save(self):
+        if not self.cachepath:
+            return
+        with open(self.cachepath, 'w', encoding='utf-8') as file:
+            json.dump({'version': SYMBOL_TABLE_VERSION, 'files': self.files}, file)
+
+def get_root_of(filepath):
+    """ Returns the addons/optionals folder the given file lives in. """
+    directory = os.path.dirname(filepath)
+    while directory and os.path.basename(directory) not in ('addons', 'optionals'):
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            return None
+        directory = parent
+    return directory or None
+
+def resolve_include(filepath, target):
+    """ Resolves an include path relative to the including file, or through the addons folder
+    for absolute PBO prefix paths like \\z\\tag\\addons\\main\\script_component.hpp """
+    parts = [part for part in re.split(r'[\\/]', target) if part]
+    if not target.startswith(('\\', '/')):
+        return os.path.normpath(os.path.join(os.path.dirname(filepath), *parts))
+    lowered = [part.lower() for part in parts]
+    if 'addons' not in lowered:
+        return None
+    root = get_root_of(filepath)
+    if root is None:
+        return None
+    index = len(lowered) - 1 - lowered[::-1].index('addons')
+    return os.path.normpath(os.path.join(root, *parts[index + 1:]))
+
+# Result of a class lookup that can't be decided, e.g. because a base class comes from another mod
+UNKNOWN = object()
+
+class ClassIndex:
+    """ Project-wide index of all classes, keyed by the lowercase full class path. """
+    def __init__(self, symbols):
+        self.symbols = symbols
+        self.classes = {}
+
+    def add_config(self, filepath):
+        """ Adds an addon's config.cpp and everything it includes to the index. """
+        self.mount(filepath, (), os.path.dirname(filepath), {os.path.normpath(filepath)})
+
+    def mount(self, filepath, prefix, addon, seen):
+        table = self.symbols.get(filepath)
+        if table is None:
+            return
+        for scope, name, base, kind, line, conditional in table['classes']:
+            path = prefix + self.unique_scope(scope, filepath) + (name,)
+            entry = ClassEntry(path, base, kind, filepath, line, addon, conditional)
+            self.classes.setdefault(tuple(part.lower() for part in path), []).append(entry)
+        for scope, target, line in table['includes']:
+            included = resolve_include(filepath, target)
+            if included is None or included in seen or not os.path.isfile(included):
+                continue
+            self.mount(included, prefix + self.unique_scope(scope, filepath), addon, seen | {included})
+
+    @staticmethod
+    def unique_scope(scope, filepath):
+        # Unparsed class scopes are only unique within their file
+        return tuple(part + ' in ' + filepath if part.startswith('<unparsed ') else part for part in scope)
+
+    def find_member(self, path, name, seen):
+        """ Returns the path of the member class `name` of the class at `path`, including inherited members.
+        Returns None if there is none, UNKNOWN if the class or one of its bases isn't fully known (external or unparsed). """
+        member = path + (name,)
+        if member in self.classes:
+            return member
+        if path in seen:
+            return None
+        seen = seen | {path}
+
+        entries = [entry for entry in self.classes.get(path, []) if entry.kind == 'class']
+        if not entries:
+            # only declared here, so it's defined by another mod or the game
+            return UNKNOWN
+
+        result = None
+        for base in {entry.base.lower() for entry in entries if entry.base}:
+            if base == path[-1]:
+                # class Turrets: Turrets refers to the member of the parent's base class
+                return UNKNOWN
+            basepath = self.find_visible(path[:-1], base, seen)
+            if basepath is None or basepath is UNKNOWN:
+                return UNKNOWN
+            inherited = self.find_member(basepath, name, seen)
+            if inherited is UNKNOWN:
+                result = UNKNOWN
+            elif inherited is not None:
+                return inherited
+        return result
+
+    def find_visible(self, scope, name, seen=frozenset()):
+        """ Returns the path of the class `name` as seen from `scope`: members (including inherited ones)
+        of the enclosing classes, innermost first. None if it isn't visible, UNKNOWN if that can't be told. """
+        result = None
+        for depth in range(len(scope), 0, -1):
+            member = self.find_member(scope[:depth], name, seen)
+            if member is UNKNOWN:
+                result = UNKNOWN
+            elif member is not None:
+                return member
+        if (name,) in self.classes:
+            return (name,)
+        return result
+
+    def is_defined(self, scope, name):
+        """ Checks if a class of the given name is visible from the given scope.
+        Classes whose visibility can't be determined count as defined. """
+        scope = tuple(part.lower() for part in scope)
+        return self.find_visible(scope, name.lower()) is not None
+
+def format_class_path(path):
+    return " >> ".join(path)
+
+def check_class_index(index):
+    """ Runs the cross-file checks on the class index. Returns the number of errors. """
     bad_count = 0
+    patches = {}
 
-    parser = argparse.ArgumentParser()
-    parser.add_argument('-m','--module', help='only search specified module addon folder', required=False, default="")
-    args = parser.parse_args()
+    for key, entries in index.classes.items():
+        definitions = [entry for entry in entries if entry.kind == 'class']
+
+        # A class body defined twice in the same addon overwrites the first one
+        first_in_addon = {}
+        for entry in definitions:
+            if entry.conditional:
+                continue
+            first = first_in_addon.setdefault(entry.addon, entry)
+            if first is not entry:
+                print("ERROR: Duplicate class definition {0} at {1} Line number: {2} (first defined at {3} Line number: {4})".format(
+                    format_class_path(entry.path), entry.filepath, entry.line, first.filepath, first.line))
+                bad_count += 1
+
+        if len(key) == 2 and key[0] == 'cfgpatches' and not reMacroName.search(definitions[0].path[-1] if definitions else ''):
+            for entry in definitions:
+                patches.setdefault(key, {}).setdefault(entry.addon, entry)
+
+        for entry in entries:
+            if entry.base is None or entry.base.lower() == entry.path[-1].lower():
+                continue
+            if not index.is_defined(entry.path[:-1], entry.base):
+                print("WARNING: class {0} inherits from undefined base class {1} at {2} Line number: {3}".format(
+                    format_class_path(entry.path), entry.base, entry.filepath, entry.line))
+
+    for key, addons in patches.items():
+        if len(addons) > 1:
+            entries = list(addons.values())
+            print("ERROR: Conflicting CfgPatches entry {0} defined in {1}".format(
+                entries[0].path[-1], ", ".join("{0} Line number: {1}".format(entry.filepath, entry.line) for entry in entries)))
+            bad_count += 1
+
+    return bad_count
+
+def check_config_classes(sqf_list, symbols):
+    """ Builds the class index from all config.cpp files in the list and checks it. """
+    index = ClassIndex(symbols)
+    for filename in sqf_list:
+        if os.path.basename(filename).lower() == 'config.cpp':
+            index.add_config(filename)
+    return check_class_index(index)
 
+def get_root_dirs(module=""):
+    """ Returns the folders that are searched for config files. """
+    root_dirs = []
     for folder in ['addons', 'optionals']:
         # Allow running from root directory as well as from inside the tools directory
         rootDir = "../" + folder
         if (os.path.exists(folder)):
             rootDir = folder
+        root_dirs.append(rootDir + '/' + module)
+    return root_dirs
 
-        for root, dirnames, filenames in os.walk(rootDir + '/' + args.module):
-          for filename in fnmatch.filter(filenames, '*.cpp'):
-            sqf_list.append(os.path.join(root, filename))
-          for filename in fnmatch.filter(filenames, '*.hpp'):
-            sqf_list.append(os.path.join(root, filename))
-          for filename in fnmatch.filter(filenames, '*.rvmat'):
-            sqf_list.append(os.path.join(root, filename))
-          for filename in fnmatch.filter(filenames, '*.cfg'):
-            sqf_list.append(os.path.join(root, filename))
+def is_config_file(filename):
+    return any(fnmatch.fnmatch(os.path.basename(filename), pattern) for pattern in CONFIG_PATTERNS)
 
-    for filename in sqf_list:
-        bad_count = bad_count + check_config_style(filename)
+def find_config_files(module=""):
+    sqf_list = []
+    for rootDir in get_root_dirs(module):
+        for root, dirnames, filenames in os.walk(rootDir):
+          for pattern in CONFIG_PATTERNS:
+            for filename in fnmatch.filter(filenames, pattern):
+              sqf_list.append(os.path.join(root, filename))
+    return sqf_list
+
+def check_config_style_captured(filepath):
+    """ Runs check_config_style and returns the error count together with the printed diagnostics. """
+    output = io.StringIO()
+    with redirect_stdout(output):
+        bad_count_file = check_config_style(filepath)
+    return bad_count_file, output.getvalue()
+
+# =============================================================================
+#  Watch mode
+# =============================================================================
+
+class PollingWatcher:
+    """ Detects changed config files by comparing modification times. """
+    def __init__(self, module, interval):
+        self.module = module
+        self.interval = interval
+        self.snapshot = self.scan()
+
+    def scan(self):
+        snapshot = {}
+        for filepath in find_config_files(self.module):
+            try:
+                stat = os.stat(filepath)
+            except OSError:
+                continue
+            snapshot[filepath] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def wait(self):
+        while True:
+            time.sleep(self.interval)
+            snapshot = self.scan()
+            changed = {path for path in snapshot.keys() | self.snapshot.keys() if snapshot.get(path) != self.snapshot.get(path)}
+            self.snapshot = snapshot
+            if changed:
+                return changed
+
+class InotifyWatcher:
+    """ Detects changed config files through Linux inotify events. """
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_ISDIR = 0x40000000
+    MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+    EVENT = struct.Struct('iIII')
+    # Editors often write a file in several steps, collect everything that arrives within this window
+    DEBOUNCE = 0.05
+
+    def __init__(self, module):
+        if not sys.platform.startswith('linux'):
+            raise OSError("inotify is only available on Linux")
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = self.libc.inotify_init()
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init failed")
+        self.watches = {}
+        self.removedDirs = set()
+        for rootDir in get_root_dirs(module):
+            self.add_tree(rootDir)
+
+    def add_tree(self, rootDir, strict=True):
+        """ Watches a directory and its subdirectories. With strict=False (trees added while watching)
+        directories that vanished in the meantime are skipped and other failures only logged. """
+        for root, dirnames, filenames in os.walk(rootDir):
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(root), self.MASK)
+            if wd < 0:
+                error = ctypes.get_errno()
+                if strict:
+                    raise OSError(error, "inotify_add_watch failed for {0}".format(root))
+                if error not in (errno.ENOENT, errno.ENOTDIR):
+                    print("WARNING: Not watching {0}: {1}".format(root, os.strerror(error)))
+                continue
+            self.watches[wd] = root
 
-    print("------\nChecked {0} files\nErrors detected: {1}".format(len(sqf_list), bad_count))
+    def remove_tree(self, rootDir):
+        """ Stops watching a directory that was moved out of the tree or deleted, including its subdirectories. """
+        for wd, directory in list(self.watches.items()):
+            if directory == rootDir or directory.startswith(rootDir + os.sep):
+                # Fails harmlessly if the kernel already dropped the watch of a deleted directory
+                self.libc.inotify_rm_watch(self.fd, wd)
+                del self.watches[wd]
+
+    def read_events(self, changed):
+        data = os.read(self.fd, 64 * 1024)
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, length = self.EVENT.unpack_from(data, offset)
+            offset += self.EVENT.size
+            name = data[offset:offset + length].rstrip(b'\0').decode('utf-8', errors='ignore')
+            offset += length
+            if mask & self.IN_DELETE_SELF:
+                self.watches.pop(wd, None)
+                continue
+            directory = self.watches.get(wd)
+            if directory is None or not name:
+                continue
+            path = os.path.join(directory, name)
+            if mask & self.IN_ISDIR:
+                if mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                    self.add_tree(path, strict=False)
+                    changed.update(find_config_files_in(path))
+                elif mask & (self.IN_MOVED_FROM | self.IN_DELETE):
+                    self.remove_tree(path)
+                    self.removedDirs.add(path)
+            else:
+                changed.add(path)
+
+    def wait(self):
+        changed = set()
+        while not changed:
+            select.select([self.fd], [], [])
+            self.read_events(changed)
+            while select.select([self.fd], [], [], self.DEBOUNCE)[0]:
+                self.read_events(changed)
+            # Removed directories are reported as well, so everything cached below them can be dropped
+            changed = {path for path in changed if is_config_file(path)} | self.removedDirs
+            self.removedDirs = set()
+        return changed
+
+def find_config_files_in(directory):
+    return [os.path.join(root, filename) for root, dirnames, filenames in os.walk(directory) for filename in filenames if is_config_file(filename)]
+
+def create_watcher(module, interval, polling=False):
+    if not polling:
+        try:
+            return InotifyWatcher(module)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(module, interval)
+
+def check_config_classes_captured(sqf_list, symbols):
+    output = io.StringIO()
+    with redirect_stdout(output):
+        bad_count = check_config_classes(sqf_list, symbols)
+    return bad_count, output.getvalue()
+
+def print_summary(file_count, bad_count):
+    print("------\nChecked {0} files\nErrors detected: {1}".format(file_count, bad_count))
     if (bad_count == 0):
         print("Config validation PASSED")
     else:
         print("Config validation FAILED")
-
     return bad_count
 
+def print_watch_summary(results, class_result):
+    return print_summary(len(results), sum(bad_count_file for bad_count_file, output in results.values()) + class_result[0])
+
+def drop_results(results, path):
+    """ Removes the results of a deleted file, or of all files below a removed directory. """
+    removed = [filename for filename in results
+        if filename == path or os.path.normpath(filename).startswith(os.path.normpath(path) + os.sep)]
+    for filename in removed:
+        del results[filename]
+        print("Removed {0}".format(filename))
+    return removed
+
+def watch(module, interval, polling=False, symbols=None):
+    """ Keeps the per-file results in memory and revalidates only the files that changed. """
+    symbols = symbols or SymbolCache()
+    results = {}
+    for filename in find_config_files(module):
+        results[filename] = check_config_style_captured(filename)
+        print(results[filename][1], end="")
+    class_result = check_config_classes_captured(list(results), symbols)
+    print(class_result[1], end="")
+    print_watch_summary(results, class_result)
+    symbols.save()
+
+    watcher = create_watcher(module, interval, polling)
+    print("Watching for changes ({0}), press Ctrl+C to stop".format(type(watcher).__name__))
+
+    try:
+        while True:
+            changed = watcher.wait()
+            start = time.perf_counter()
+            print("\n------\nRevalidating {0} changed file(s)".format(len(changed)))
+            removed = []
+            for filename in sorted(changed):
+                if os.path.isfile(filename):
+                    results[filename] = check_config_style_captured(filename)
+                    print(results[filename][1], end="")
+                else:
+                    removed.extend(drop_results(results, filename))
+            symbols.invalidate(changed)
+            symbols.invalidate(removed)
+            class_result = check_config_classes_captured(list(results), symbols)
+            print(class_result[1], end="")
+            print_watch_summary(results, class_result)
+            print("Revalidated in {0:.3f}s".format(time.perf_counter() - start))
+    except KeyboardInterrupt:
+        pass
+
+    symbols.save()
+    return 0
+
+def main():
+
+    print("Validating Config Style")
+
+    bad_count = 0
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-m','--module', help='only search specified module addon folder', required=False, default="")
+    parser.add_argument('-w','--watch', help='keep running and revalidate files when they change', action='store_true')
+    parser.add_argument('--poll', help='use polling instead of inotify in watch mode', action='store_true')
+    parser.add_argument('--interval', help='polling interval in seconds for watch mode', type=float, default=0.25)
+    parser.add_argument('--cache', help='file to keep parsed class symbol tables in between runs', required=False, default=None)
+    args = parser.parse_args()
+
+    symbols = SymbolCache(args.cache)
+
+    if args.watch:
+        return watch(args.module, args.interval, args.poll, symbols)
+
+    sqf_list = find_config_files(args.module)
+
+    for filename in sqf_list:
+        bad_count = bad_count + check_config_style(filename)
+
+    bad_count = bad_count + check_config_classes(sqf_list, symbols)
+    symbols.save()
+
+    return print_summary(len(sqf_list), bad_count)
+
 if __name__ == "__main__":
     sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the mod validation tools in Data/tools/ (validate_config.py, stringtableDiag.py).
+Generates a synthetic mod tree, times every tool's real command line end to end and
+per phase (discovery, parse, check, report), records peak RSS and writes the results
+as JSON, so runs before and after a change can be compared with --compare.
+"""
+
+import os
+import sys
+import json
+import glob
+import time
+import random
+import shutil
+import cProfile
+import platform
+import argparse
+import pstats
+import tempfile
+import subprocess
+from datetime import datetime, timezone
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+TOOLS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), "Data", "tools")
+TOOLS = ["validate_config", "stringtableDiag"]
+
+LANGUAGES = [
+    "Original", "English", "German", "French", "Italian", "Spanish", "Portuguese", "Polish", "Czech",
+    "Russian", "Hungarian", "Turkish", "Japanese", "Korean", "Chinese", "Chinesesimp", "Swedish",
+    "Finnish", "Dutch", "Ukrainian",
+]
+
+# =============================================================================
+#  Synthetic Project
+# =============================================================================
+
+def write_nested_classes(lines, rng, prefix, depth, width, block_lines, indent):
+    """Write `width` classes per level, `depth` levels deep, each with a generated array block."""
+    pad = "    " * indent
+    for i in range(width):
+        name = f"{prefix}_{i}"
+        lines.append(f"{pad}class {name}: Base_{indent % 3} {{")
+        lines.append(f"{pad}    displayName = \"{name}\";")
+        lines.append(f"{pad}    values[] = {{")
+        for j in range(block_lines):
+            lines.append(f"{pad}        {{{rng.random():.4f}, {rng.randint(0, 999)}, \"{name}_{j}\"}},")
+        lines.append(f"{pad}        {{0, 0, \"\"}}")
+        lines.append(f"{pad}    }};")
+        if depth > 1:
+            for base in range(3):
+                lines.append(f"{pad}    class Base_{base};")
+            write_nested_classes(lines, rng, name, depth - 1, width, block_lines, indent + 1)
+        lines.append(f"{pad}}};")
+
+def generate_addon(addon_dir, addon, rng, args):
+    os.makedirs(addon_dir, exist_ok=True)
+
+    with open(os.path.join(addon_dir, "config.cpp"), "w", encoding="utf-8") as f:
+        f.write("\n".join([
+            "class CfgPatches {",
+            f"    class bench_{addon} {{",
+            "        units[] = {};",
+            "        requiredAddons[] = {\"cba_main\"};",
+            "    };",
+            "};",
+            "class CfgVehicles {",
+            "    class Base_0;",
+            "    class Base_1;",
+            "    class Base_2;",
+            "    #include \"CfgVehicles.hpp\"",
+            "};",
+            "",
+        ]))
+
+    lines = []
+    for c in range(args.classes):
+        write_nested_classes(lines, rng, f"bench_{addon}_{c}", args.depth, 1, args.block_lines, 0)
+    with open(os.path.join(addon_dir, "CfgVehicles.hpp"), "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+
+    languages = LANGUAGES[:args.languages]
+    with open(os.path.join(addon_dir, "stringtable.xml"), "w", encoding="utf-8") as f:
+        f.write('<?xml version="1.0" encoding="utf-8"?>\n')
+        f.write(f'<Project name="BENCH">\n  <Package name="{addon}">\n    <Container name="main">\n')
+        for k in range(args.keys):
+            f.write(f'      <Key ID="STR_bench_{addon}_{k}">\n')
+            for i, language in enumerate(languages):
+                if i < 2 or rng.random() >= args.missing:
+                    f.write(f"        <{language}>Text {k} ({language})</{language}>\n")
+            f.write("      </Key>\n")
+        f.write("    </Container>\n  </Package>\n</Project>\n")
+
+def generate_project(root, args):
+    """Generate a synthetic mod tree (addons/<addon>/config.cpp, CfgVehicles.hpp, stringtable.xml)."""
+    rng = random.Random(args.seed)
+    for a in range(args.addons):
+        generate_addon(os.path.join(root, "addons", f"addon{a:03d}"), f"addon{a:03d}", rng, args)
+    open(os.path.join(root, MARKER), "w").close()
+
+# Marks a project generated by this script, only those get their tools replaced
+MARKER = ".bench_mod_tools"
+
+def install_tools(root):
+    """Copy the current tools into <root>/tools/, where sync_workflows.py puts them in a mod repo."""
+    os.makedirs(os.path.join(root, "tools"), exist_ok=True)
+    for path in glob.glob(os.path.join(TOOLS_DIR, "*.py")):
+        shutil.copy(path, os.path.join(root, "tools"))
+
+# =============================================================================
+#  Phase Runs (executed in a fresh subprocess per tool)
+# =============================================================================
+
+class PhaseTimer:
+    def __init__(self, profile=None):
+        self.phases = {}
+        self.profile = profile
+
+    def run(self, phase, func, *args):
+        start = time.perf_counter()
+        if self.profile:
+            self.profile.enable()
+        try:
+            return func(*args)
+        finally:
+            if self.profile:
+                self.profile.disable()
+            self.phases[phase] = self.phases.get(phase, 0.0) + time.perf_counter() - start
+
+def run_validate_config(project, timer, jobs):
+    """The steps of validate_config.main(), diagnostics are printed in the report phase."""
+    import validate_config
+
+    os.chdir(project)
+    files = timer.run("discovery", validate_config.find_config_files, "")
+
+    symbols = validate_config.SymbolCache()
+    def parse():
+        for filename in files:
+            symbols.get(filename)
+    timer.run("parse", parse)
+
+    def check():
+        results = [validate_config.check_config_style_captured(filename) for filename in files]
+        return results, validate_config.check_config_classes_captured(files, symbols)
+    results, class_result = timer.run("check", check)
+
+    def report():
+        for bad_count_file, output in results:
+            print(output, end="")
+        print(class_result[1], end="")
+        return validate_config.print_summary(len(files), sum(bad_count_file for bad_count_file, output in results) + class_result[0])
+    timer.run("report", report)
+
+def run_stringtable_diag(project, timer, jobs):
+    """The steps of stringtableDiag.main() (build_report, then the console report)."""
+    import stringtableDiag
+
+    projectpath = os.path.join(project, "addons")
+    timer.run("discovery", os.listdir, projectpath)
+    results = timer.run("parse", stringtableDiag.analyze_modules, projectpath, jobs)
+    report = timer.run("check", lambda: stringtableDiag.Report(results, stringtableDiag.merge_results(results)))
+    timer.run("report", lambda: print(stringtableDiag.render_console(report), end=""))
+    timer.run("markdown", lambda: print(stringtableDiag.render_markdown(report), end=""))
+
+RUNNERS = {
+    "validate_config": run_validate_config,
+    "stringtableDiag": run_stringtable_diag,
+}
+
+def peak_rss_kb(who="RUSAGE_SELF"):
+    """Peak RSS of this process, or with RUSAGE_CHILDREN of its largest finished child (pool workers)."""
+    if resource is None:
+        return None
+    rss = resource.getrusage(getattr(resource, who)).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+def run_tool(tool, project, jobs, profile_dir):
+    """Run the phases of one tool in this process, the tool's output is followed by the timings as JSON."""
+    # the same tools the command line run used
+    sys.path.insert(0, os.path.join(os.path.abspath(project), "tools"))
+    profile = cProfile.Profile() if profile_dir else None
+    timer = PhaseTimer(profile)
+
+    RUNNERS[tool](os.path.abspath(project), timer, jobs)
+
+    if profile:
+        os.makedirs(profile_dir, exist_ok=True)
+        profile.dump_stats(os.path.join(profile_dir, f"{tool}.pstats"))
+
+    print()
+    json.dump({"phases": timer.phases, "peak_rss_kb": peak_rss_kb(), "peak_rss_workers_kb": peak_rss_kb("RUSAGE_CHILDREN")}, sys.stdout)
+
+def run_command(tool, command, project, finished=None):
+    """Run a command in the project, exits unless it succeeded or `finished(stdout)` says it ran to the end."""
+    result = subprocess.run(command, cwd=project, capture_output=True, text=True)
+    if result.returncode != 0 and not (finished and finished(result.stdout)):
+        print(f"  ❌ {tool} failed:\n{result.stdout[-2000:]}{result.stderr}")
+        sys.exit(1)
+    return result
+
+def measure_tool(tool, project, jobs, profile_dir):
+    """Time the tool's command line end to end, then its phases in a second fresh interpreter.
+    Returns the end-to-end time, phase times and peak RSS of the phase run."""
+    command = [sys.executable, os.path.join("tools", f"{tool}.py")]
+    if jobs and tool == "stringtableDiag":
+        command += ["--jobs", str(jobs)]
+    # validate_config exits with its error count, a project with diagnostics is still a complete run
+    finished = (lambda stdout: "Config validation FAILED" in stdout) if tool == "validate_config" else None
+    start = time.perf_counter()
+    exit_code = run_command(tool, command, project, finished).returncode
+    wall = time.perf_counter() - start
+
+    command = [sys.executable, os.path.realpath(__file__), "--run", tool, "--project", project]
+    if jobs:
+        command += ["--jobs", str(jobs)]
+    if profile_dir:
+        # validate_config runs from inside the project, keep the stats outside of it
+        command += ["--profile", os.path.abspath(profile_dir)]
+    output = run_command(tool, command, project).stdout
+
+    data = json.loads(output.strip().splitlines()[-1])
+    data["wall"] = wall
+    data["exit_code"] = exit_code
+    return data
+
+# =============================================================================
+#  Reporting
+# =============================================================================
+
+def print_results(results, baseline=None):
+    for tool, data in results.items():
+        old = (baseline or {}).get(tool)
+        print(f"\n🔧 {tool}")
+        rows = [("total", data["wall"], old and old.get("wall"))]
+        rows += [(phase, seconds, old and old.get("phases", {}).get(phase)) for phase, seconds in data["phases"].items()]
+        for name, seconds, old_seconds in rows:
+            line = f"  {name:<10} {seconds:8.3f}s"
+            if old_seconds:
+                line += f"  ({(seconds - old_seconds) / old_seconds:+.1%} vs baseline)"
+            print(line)
+        for key, name in [("peak_rss_kb", "peak RSS"), ("peak_rss_workers_kb", "workers")]:
+            # workers: largest worker process, only set when the tool ran a process pool
+            if data.get(key):
+                line = f"  {name:<10} {data[key] / 1024:8.1f} MB"
+                if old and old.get(key):
+                    line += f"  ({(data[key] - old[key]) / old[key]:+.1%} vs baseline)"
+                print(line)
+        if data.get("exit_code"):
+            print(f"  {'exit code':<10} {data['exit_code']:8d}")
+
+def print_profiles(profile_dir, top):
+    for tool in TOOLS:
+        path = os.path.join(profile_dir, f"{tool}.pstats")
+        if os.path.isfile(path):
+            print(f"\n🔥 Hottest functions of {tool} ({path})")
+            pstats.Stats(path).sort_stats("cumulative").print_stats(top)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark validate_config.py and stringtableDiag.py on a synthetic mod")
+    parser.add_argument("--addons", type=int, default=20, help="number of addons")
+    parser.add_argument("--classes", type=int, default=50, help="top level classes per addon")
+    parser.add_argument("--depth", type=int, default=4, help="class nesting depth")
+    parser.add_argument("--block-lines", type=int, default=20, help="lines of generated array data per class")
+    parser.add_argument("--keys", type=int, default=2000, help="stringtable keys per addon")
+    parser.add_argument("--languages", type=int, default=15, help=f"languages per stringtable (max {len(LANGUAGES)})")
+    parser.add_argument("--missing", type=float, default=0.2, help="chance of a missing translation")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--tools", nargs="+", choices=TOOLS, default=TOOLS)
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="jobs passed to stringtableDiag (default: number of CPUs)")
+    parser.add_argument("--project", help="use (or keep) the synthetic project in this directory, or an existing mod checkout with its own tools/")
+    parser.add_argument("--output", default="bench_results.json", help="JSON file the results are written to")
+    parser.add_argument("--compare", metavar="JSON", help="earlier results to compare against")
+    parser.add_argument("--profile", metavar="DIR", help="write cProfile stats per tool to this directory (use -j 1 to include stringtable parsing)")
+    parser.add_argument("--top", type=int, default=15, help="number of hottest functions shown with --profile")
+    parser.add_argument("--run", choices=TOOLS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    args.languages = min(args.languages, len(LANGUAGES))
+
+    if args.run:
+        return run_tool(args.run, args.project, args.jobs, args.profile)
+
+    config = {key: getattr(args, key) for key in ["addons", "classes", "depth", "block_lines", "keys", "languages", "missing", "seed"]}
+
+    with tempfile.TemporaryDirectory(prefix="bench_mod_") as tmp:
+        project = args.project or tmp
+        if not os.path.isdir(os.path.join(project, "addons")):
+            print(f"🏗️ Generating synthetic project in {project} ...")
+            start = time.perf_counter()
+            generate_project(project, args)
+            print(f"  done in {time.perf_counter() - start:.1f}s")
+
+        if os.path.isfile(os.path.join(project, MARKER)):
+            install_tools(project)
+        else:
+            # An existing mod checkout, benchmark it with its own tools and never overwrite them
+            missing = [tool for tool in args.tools if not os.path.isfile(os.path.join(project, "tools", f"{tool}.py"))]
+            if missing:
+                print(f"❌ {project} is not a generated project and has no tools/{', tools/'.join(missing)}.py")
+                sys.exit(1)
+            print(f"ℹ️ Using the tools of the existing project {project}")
+
+        results = {}
+        for tool in args.tools:
+            print(f"⏱️ Running {tool} ...")
+            results[tool] = measure_tool(tool, project, args.jobs, args.profile)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f).get("results")
+
+    print_results(results, baseline)
+    if args.profile:
+        print_profiles(args.profile, args.top)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "config": config,
+            "results": results,
+        }, f, indent=2)
+    print(f"\n💾 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
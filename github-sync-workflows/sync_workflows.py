@@ -3,15 +3,23 @@
 Syncs files from the local Data directory into multiple GitHub repositories.
 Refactored for safety, clarity, and performance.
 Includes a blacklist feature: files listed in BLACKLIST_FILES are deleted from the repo if present.
+The remote state of all synced and blacklisted paths is read up front with batched GraphQL queries
+(one per owner), falling back to the Contents API per file if that fails.
 """
 
 import os
 import sys
+import json
 import base64
+import hashlib
 import requests
 from sync_data import REPOSITORIES, IGNORE_FILES, PATH_MAP, BLACKLIST_FILES
 
 API_BASE = "https://api.github.com"
+GRAPHQL_URL = f"{API_BASE}/graphql"
+BRANCH = "main"
+# Upper bound of file aliases per GraphQL query, keeps every query well below GitHub's node limits
+GRAPHQL_BATCH_SIZE = 200
 
 # =============================================================================
 #  Auth & Configuration
@@ -51,24 +59,138 @@ def should_ignore(repo_info, relative_path):
             return True
     return False
 
-def map_relative_path(relative_path):
+def map_relative_path(relative_path, verbose=True):
     """Map local path (under Data/) to remote repo path via PATH_MAP."""
     for local_prefix, remote_prefix in PATH_MAP.items():
         if relative_path.startswith(local_prefix):
             remainder = relative_path[len(local_prefix):]
             mapped = os.path.join(remote_prefix, remainder).replace("\\", "/")
-            print(f"  🔀 {relative_path} → {mapped}")
+            if verbose:
+                print(f"  🔀 {relative_path} → {mapped}")
             return mapped
-    print(f"  ⚠️  No mapping found for: {relative_path} (using as-is)")
+    if verbose:
+        print(f"  ⚠️  No mapping found for: {relative_path} (using as-is)")
     return relative_path
 
+def list_local_files():
+    """Return (full path, path relative to Data/) for every file to sync."""
+    local_files = []
+    for root, _, files in os.walk(DATA_DIR):
+        for file in files:
+            full_path = os.path.join(root, file)
+            relative_path = os.path.relpath(full_path, DATA_DIR).replace("\\", "/")
+            local_files.append((full_path, relative_path))
+    return local_files
+
+def git_blob_oid(data):
+    """Git blob SHA of the given bytes, identical to the OID GitHub reports for the same content."""
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+# =============================================================================
+#  Remote State
+# =============================================================================
+
+# (owner, repo) -> {path: {"sha": blob oid, "text": content or None}}, missing paths are absent.
+# Repos without an entry weren't prefetched and are read through the Contents API.
+REMOTE_STATE = {}
+
+def build_remote_state_query(batch):
+    """Build one aliased GraphQL query for a list of (repo, path, needs_text)."""
+    repos = {}
+    for repo, path, needs_text in batch:
+        repos.setdefault(repo, []).append((path, needs_text))
+
+    lines = []
+    aliases = {}
+    for r, (repo, paths) in enumerate(repos.items()):
+        lines.append(f"  r{r}: repository(owner: $owner, name: {json.dumps(repo)}) {{")
+        for f, (path, needs_text) in enumerate(paths):
+            fields = "oid text" if needs_text else "oid"
+            expression = json.dumps(f"{BRANCH}:{path}")
+            lines.append(f"    f{f}: object(expression: {expression}) {{ ... on Blob {{ {fields} }} }}")
+            aliases[(f"r{r}", f"f{f}")] = (repo, path)
+        lines.append("  }")
+
+    query = "query($owner: String!) {\n" + "\n".join(lines) + "\n}"
+    return query, aliases
+
+def prefetch_remote_state(owner, wanted):
+    """
+    Read blob OIDs (and text where needed) of all wanted paths of one owner's repos
+    with as few GraphQL requests as possible. wanted: {repo: {path: needs_text}}.
+    Repos that can't be read are left out of REMOTE_STATE (per-file REST fallback).
+    """
+    items = [(repo, path, needs_text) for repo, paths in wanted.items() for path, needs_text in paths.items()]
+    state = {}
+    failed_repos = set()
+    requests_made = 0
+    for start in range(0, len(items), GRAPHQL_BATCH_SIZE):
+        batch = items[start:start + GRAPHQL_BATCH_SIZE]
+        query, aliases = build_remote_state_query(batch)
+        try:
+            r = requests.post(GRAPHQL_URL, headers=get_headers(owner), json={"query": query, "variables": {"owner": owner}})
+            requests_made += 1
+            result = r.json()
+        except Exception as e:
+            print(f"  ⚠️  GraphQL request failed for {owner}: {e}")
+            failed_repos.update(repo for repo, _, _ in batch)
+            continue
+        if r.status_code != 200 or not result.get("data"):
+            err = "; ".join(error.get("message", "") for error in result.get("errors", [])) or r.text
+            print(f"  ⚠️  GraphQL query failed for {owner} ({r.status_code}): {err}")
+            failed_repos.update(repo for repo, _, _ in batch)
+            continue
+
+        for (repo_alias, file_alias), (repo, path) in aliases.items():
+            repo_data = result["data"].get(repo_alias)
+            if repo_data is None:
+                failed_repos.add(repo)
+                continue
+            files = state.setdefault(repo, {})
+            blob = repo_data.get(file_alias)
+            if blob and blob.get("oid"):
+                files[path] = {"sha": blob["oid"], "text": blob.get("text")}
+
+    for repo, files in state.items():
+        if repo not in failed_repos:
+            REMOTE_STATE[(owner, repo)] = files
+    for repo in sorted(failed_repos):
+        print(f"  ⚠️  Could not read {owner}/{repo} via GraphQL, falling back to REST")
+
+    print(f"  📡 {owner}: remote state of {len(items)} paths read in {requests_made} GraphQL request(s)")
+
+def prefetch_all_remote_state(local_files):
+    """Prefetch the remote state of every synced and blacklisted path, grouped by owner."""
+    print("📡 Reading remote state...")
+    by_owner = {}
+    for repo_info in REPOSITORIES:
+        paths = {path: False for path in BLACKLIST_FILES}
+        for _, relative_path in local_files:
+            if not should_ignore(repo_info, relative_path):
+                # Text is only needed for the whitespace-insensitive comparison of synced files
+                paths[map_relative_path(relative_path, verbose=False)] = True
+        by_owner.setdefault(repo_info["owner"], {})[repo_info["repo"]] = paths
+
+    for owner, wanted in by_owner.items():
+        prefetch_remote_state(owner, wanted)
+
 def get_remote_file(owner, repo, path):
-    """Fetch file metadata from GitHub (returns dict or None)."""
+    """Return {"sha": blob oid, "text": content or None} of a remote file, or None if it doesn't exist."""
+    if (owner, repo) in REMOTE_STATE:
+        return REMOTE_STATE[(owner, repo)].get(path)
+
     url = f"{API_BASE}/repos/{owner}/{repo}/contents/{path}"
     r = requests.get(url, headers=get_headers(owner))
-    if r.status_code == 200:
-        return r.json()
-    return None
+    if r.status_code != 200:
+        return None
+    data = r.json()
+    text = None
+    if data.get("content"):
+        try:
+            text = base64.b64decode(data["content"]).decode()
+        except Exception:
+            pass  # if decoding fails, compare by SHA only
+    return {"sha": data.get("sha"), "text": text}
 
 def upload_file(owner, repo, path, content, message):
     """Upload or update a file in a target repository."""
@@ -80,22 +202,21 @@ def upload_file(owner, repo, path, content, message):
 
     # Check for no changes (avoid unnecessary commits)
     encoded_content = base64.b64encode(content.encode()).decode()
-    if existing and existing.get("content"):
-        try:
-            remote_content = base64.b64decode(existing["content"]).decode().strip()
-            if remote_content.strip() == content.strip():
-                print(f"  ⏩ Skipped (no change): {path}")
-                return True
-        except Exception:
-            pass  # if decoding fails, proceed to upload
+    if existing:
+        if existing.get("sha") == git_blob_oid(content.encode()):
+            print(f"  ⏩ Skipped (no change): {path}")
+            return True
+        if existing.get("text") is not None and existing["text"].strip() == content.strip():
+            print(f"  ⏩ Skipped (no change): {path}")
+            return True
 
     data = {
         "message": message,
         "content": encoded_content,
-        "branch": "main",
+        "branch": BRANCH,
     }
 
-    if existing and "sha" in existing:
+    if existing and existing.get("sha"):
         data["sha"] = existing["sha"]
 
     url = f"{API_BASE}/repos/{owner}/{repo}/contents/{path}"
@@ -119,14 +240,14 @@ def delete_file(owner, repo, path):
         return False  # return False to indicate "not actually deleted"
 
     existing = get_remote_file(owner, repo, path)
-    if not existing or "sha" not in existing:
+    if not existing or not existing.get("sha"):
         print(f"  ⏩ Skipped delete (file not found): {path}")
         return False  # nothing deleted
 
     data = {
         "message": f"🗑️ Delete blacklisted file {path}",
         "sha": existing["sha"],
-        "branch": "main",
+        "branch": BRANCH,
     }
 
     url = f"{API_BASE}/repos/{owner}/{repo}/contents/{path}"
@@ -158,6 +279,10 @@ def main():
     total_deleted = 0
     total_failed = 0
 
+    local_files = list_local_files()
+    if not DRY_RUN:
+        prefetch_all_remote_state(local_files)
+
     for repo_info in REPOSITORIES:
         owner = repo_info["owner"]
         repo = repo_info["repo"]
@@ -174,39 +299,36 @@ def main():
                     total_skipped += 0  # or +=0, just skip
 
         # --- Sync Data/ files into target repo ---
-        for root, _, files in os.walk(DATA_DIR):
-            for file in files:
-                full_path = os.path.join(root, file)
-                relative_path = os.path.relpath(full_path, DATA_DIR).replace("\\", "/")
-                mapped_path = map_relative_path(relative_path)
-
-                # --- Ignore handling ---
-                if should_ignore(repo_info, relative_path):
-                    print(f"  🚫 Ignored: {relative_path}")
-                    total_skipped += 1
-                    continue
-
-                # --- Upload file ---
-                try:
-                    with open(full_path, "r", encoding="utf-8") as f:
-                        content = f.read()
-                except Exception as e:
-                    print(f"  ❌ Failed to read {relative_path}: {e}")
-                    total_failed += 1
-                    continue
-
-                ok = upload_file(
-                    owner,
-                    repo,
-                    mapped_path,
-                    content,
-                    f"📝 Update {mapped_path}"
-                )
-
-                if ok:
-                    total_synced += 1
-                else:
-                    total_failed += 1
+        for full_path, relative_path in local_files:
+            mapped_path = map_relative_path(relative_path)
+
+            # --- Ignore handling ---
+            if should_ignore(repo_info, relative_path):
+                print(f"  🚫 Ignored: {relative_path}")
+                total_skipped += 1
+                continue
+
+            # --- Upload file ---
+            try:
+                with open(full_path, "r", encoding="utf-8") as f:
+                    content = f.read()
+            except Exception as e:
+                print(f"  ❌ Failed to read {relative_path}: {e}")
+                total_failed += 1
+                continue
+
+            ok = upload_file(
+                owner,
+                repo,
+                mapped_path,
+                content,
+                f"📝 Update {mapped_path}"
+            )
+
+            if ok:
+                total_synced += 1
+            else:
+                total_failed += 1
 
     # Summary
     print("\n📊 Summary:")
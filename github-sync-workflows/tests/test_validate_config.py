@@ -0,0 +1,116 @@
+"""Regression tests for the class index of Data/tools/validate_config.py."""
+
+import io
+import os
+import sys
+import tempfile
+import textwrap
+import unittest
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), "Data", "tools"))
+
+import validate_config
+
+
+def check_config(content):
+    """Run the class index checks on a single addon config.cpp, returns (errors, output)."""
+    with tempfile.TemporaryDirectory() as tmp:
+        filepath = os.path.join(tmp, "addons", "main", "config.cpp")
+        os.makedirs(os.path.dirname(filepath))
+        with open(filepath, "w", encoding="utf-8") as file:
+            file.write(textwrap.dedent(content))
+        output = io.StringIO()
+        with redirect_stdout(output):
+            bad_count = validate_config.check_config_classes([filepath], validate_config.SymbolCache())
+        return bad_count, output.getvalue()
+
+
+class ClassIndexTest(unittest.TestCase):
+    def test_nested_macro_class_names(self):
+        bad_count, output = check_config("""
+            class CfgVehicles {
+                class Car;
+                class GVAR(DOUBLES(car,one)): Car {
+                    class Turrets {
+                        class MainTurret {};
+                    };
+                };
+                class GVAR(DOUBLES(car,two)): Car {
+                    class Turrets {
+                        class MainTurret {};
+                    };
+                };
+            };
+        """)
+        self.assertEqual(bad_count, 0, output)
+        self.assertNotIn("Duplicate", output)
+
+    def test_unparsed_class_header_keeps_children_apart(self):
+        bad_count, output = check_config("""
+            class CfgVehicles {
+                class A: B(C(D(E(F(1))))) {
+                    class Turrets {};
+                };
+                class G: H(I(J(K(L(1))))) {
+                    class Turrets {};
+                };
+            };
+        """)
+        self.assertEqual(bad_count, 0, output)
+
+    def test_base_class_inherited_from_enclosing_class(self):
+        bad_count, output = check_config("""
+            class CfgVehicles {
+                class LandVehicle;
+                class Car: LandVehicle {
+                    class NewTurret;
+                };
+                class Car_F: Car {
+                    class Turrets {
+                        class MainTurret: NewTurret {};
+                    };
+                };
+            };
+        """)
+        self.assertEqual(bad_count, 0, output)
+        self.assertNotIn("undefined base class", output)
+
+    def test_base_class_of_external_enclosing_class(self):
+        bad_count, output = check_config("""
+            class CfgVehicles {
+                class Tank;
+                class MyTank: Tank {
+                    class Turrets {
+                        class MainTurret: NewTurret {};
+                    };
+                };
+            };
+        """)
+        self.assertNotIn("undefined base class", output)
+
+    def test_undefined_base_class(self):
+        bad_count, output = check_config("""
+            class CfgVehicles {
+                class Car;
+                class MyCar: Car {};
+                class Broken: Missing {};
+            };
+        """)
+        self.assertIn("Broken inherits from undefined base class Missing", output)
+        self.assertNotIn("MyCar inherits", output)
+
+    def test_duplicate_class_definition(self):
+        bad_count, output = check_config("""
+            class CfgVehicles {
+                class Car;
+                class MyCar: Car {};
+                class MyCar: Car {};
+            };
+        """)
+        self.assertEqual(bad_count, 1, output)
+        self.assertIn("Duplicate class definition CfgVehicles >> MyCar", output)
+
+
+if __name__ == "__main__":
+    unittest.main()
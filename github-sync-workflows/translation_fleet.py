@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Translation coverage dashboard for all repositories in sync_data.py.
+Analyzes the stringtables of every repo's local checkout concurrently, prints one
+cross-repo coverage report and updates each repo's "Translations" issue through a
+bounded pool. Issues whose report didn't change are skipped (digest check).
+"""
+
+import os
+import sys
+import argparse
+import subprocess
+import traceback
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from sync_data import REPOSITORIES
+
+# The analysis and issue handling are shared with the per-repo tools in Data/tools/
+TOOLS_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), "Data", "tools")
+sys.path.insert(0, TOOLS_DIR)
+
+import stringtableDiag
+
+# =============================================================================
+#  Auth & Configuration
+# =============================================================================
+
+def get_token_for_repo(owner):
+    """Get the appropriate PAT for a repo owner (e.g., PAT_OVERLORDZORN), or None."""
+    return os.getenv(f"PAT_{owner.upper().replace('-', '_')}")
+
+def get_checkout(checkouts_dir, repo_info):
+    return os.path.join(checkouts_dir, repo_info["repo"])
+
+def repo_name(repo_info):
+    return f"{repo_info['owner']}/{repo_info['repo']}"
+
+# =============================================================================
+#  Analysis
+# =============================================================================
+
+def clone_repo(checkouts_dir, repo_info):
+    """Shallow-clone a repository that has no local checkout yet."""
+    checkout = get_checkout(checkouts_dir, repo_info)
+    if os.path.isdir(checkout):
+        return True
+    token = get_token_for_repo(repo_info["owner"])
+    auth = f"x-access-token:{token}@" if token else ""
+    url = f"https://{auth}github.com/{repo_name(repo_info)}.git"
+    result = subprocess.run(["git", "clone", "--quiet", "--depth", "1", url, checkout], capture_output=True, text=True)
+    if result.returncode != 0:
+        print(f"  ❌ Failed to clone {repo_name(repo_info)}: {result.stderr.strip()}")
+        return False
+    print(f"  📥 Cloned {repo_name(repo_info)}")
+    return True
+
+def analyze_repo(checkout, cachepath):
+    """Worker entry point, returns the stringtableDiag report of one checkout (None without addons)."""
+    projectpath = os.path.join(checkout, "addons")
+    if not os.path.isdir(projectpath):
+        return None
+    # Repos already run in parallel, so every repo analyzes its modules serially
+    return stringtableDiag.build_report(projectpath, jobs=1, cachepath=cachepath)
+
+def analyze_fleet(repos, checkouts_dir, cache_dir, jobs):
+    """Analyzes all checkouts concurrently, returns {repo name: report or None}."""
+    if not repos:
+        return {}
+    checkouts = [get_checkout(checkouts_dir, repo_info) for repo_info in repos]
+    cachepaths = [
+        os.path.join(cache_dir, f"{repo_info['owner']}_{repo_info['repo']}.json") if cache_dir else None
+        for repo_info in repos
+    ]
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        reports = list(executor.map(analyze_repo, checkouts, cachepaths))
+    return {repo_name(repo_info): report for repo_info, report in zip(repos, reports)}
+
+def render_fleet_report(reports):
+    """Returns the cross-repo coverage table as markdown (% of localized keys per language)."""
+    languages = {}
+    for report in reports.values():
+        if report is not None:
+            languages.update(dict.fromkeys(report.languages))
+    languages = list(languages)
+
+    lines = []
+    lines.append("| Repository | Keys | " + " | ".join(languages) + " |")
+    lines.append("|------------|-----:|" + "|".join("-----:" for language in languages) + "|")
+
+    keysum = 0
+    localizedsum = dict.fromkeys(languages, 0)
+    for name, report in reports.items():
+        if report is None or report.keysum == 0:
+            continue
+        keysum += report.keysum
+        cells = []
+        for language in languages:
+            localized = report.localized.get(language, 0)
+            localizedsum[language] += localized
+            cells.append("{}%".format(round(100 * localized / report.keysum)))
+        lines.append("| {} | {} | {} |".format(name, report.keysum, " | ".join(cells)))
+
+    if keysum:
+        lines.append("| **Total** | **{}** | {} |".format(
+            keysum, " | ".join("**{}%**".format(round(100 * localizedsum[language] / keysum)) for language in languages)))
+
+    return "\n".join(lines) + "\n"
+
+# =============================================================================
+#  Issue updates
+# =============================================================================
+
+def update_repo_issue(repo_info, report, dry_run):
+    """Updates one repo's translation issue. Returns 'updated', 'unchanged', 'skipped' or 'failed'."""
+    # Needs PyGithub, only imported when issues are actually touched
+    import stringtableDeploy
+    from github import Github, Auth
+
+    name = repo_name(repo_info)
+    token = get_token_for_repo(repo_info["owner"])
+    if not token:
+        print(f"  ❌ {name}: Missing token PAT_{repo_info['owner'].upper().replace('-', '_')}")
+        return "failed"
+
+    try:
+        github = Github(auth=Auth.Token(token))
+        repo = github.get_repo(name)
+        # No issue number here, TRANSLATION_ISSUE only applies to the single repo of the deploy workflow.
+        # A dry run leaves the issue cache untouched.
+        issue = stringtableDeploy.find_translation_issue(github, repo, save_cache=not dry_run)
+        if issue is None:
+            return "skipped"
+        body = stringtableDeploy.render_translation_report(report)
+
+        if dry_run:
+            match = stringtableDeploy.DIGEST_PATTERN.search(issue.body or "")
+            if match and match.group(1) == stringtableDeploy.report_digest(body):
+                return "unchanged"
+            print(f"  [Dry-run] Would update {name} #{issue.number}")
+            return "updated"
+
+        return "updated" if stringtableDeploy.update_issue(issue, body) else "unchanged"
+    except Exception:
+        print(f"  ❌ {name}: Failed to update translation issue.")
+        print(traceback.format_exc())
+        return "failed"
+
+def update_fleet_issues(repos, reports, workers, dry_run):
+    """Updates the translation issues of all repos with stringtables through a bounded thread pool."""
+    todo = [repo_info for repo_info in repos if reports.get(repo_name(repo_info)) is not None and reports[repo_name(repo_info)].keysum > 0]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(lambda repo_info: update_repo_issue(repo_info, reports[repo_name(repo_info)], dry_run), todo))
+    return {repo_name(repo_info): result for repo_info, result in zip(todo, results)}
+
+# =============================================================================
+#  Main
+# =============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Translation coverage across all repositories in sync_data.py")
+    parser.add_argument("mode", nargs="?", choices=["dry-run", "real", "report"], default="dry-run",
+        help="dry-run: report and show issue changes, real: update issues, report: coverage report only")
+    parser.add_argument("--checkouts", default="checkouts", help="directory with one checkout per repo (named like the repo)")
+    parser.add_argument("--clone", action="store_true", help="shallow-clone repositories that have no checkout yet")
+    parser.add_argument("--cache-dir", default=os.environ.get("STRINGTABLE_CACHE_DIR") or None, help="directory for per-repo stringtable caches")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="number of repos analyzed in parallel (default: number of CPUs)")
+    parser.add_argument("--workers", type=int, default=4, help="number of issues updated in parallel")
+    parser.add_argument("--output", help="also write the coverage report to this markdown file")
+    args = parser.parse_args()
+
+    print(f"🔧 Mode: {args.mode}\n")
+
+    if args.clone:
+        os.makedirs(args.checkouts, exist_ok=True)
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            list(executor.map(lambda repo_info: clone_repo(args.checkouts, repo_info), REPOSITORIES))
+
+    repos = []
+    for repo_info in REPOSITORIES:
+        if os.path.isdir(get_checkout(args.checkouts, repo_info)):
+            repos.append(repo_info)
+        else:
+            print(f"  ⏩ Skipped (no checkout): {repo_name(repo_info)}")
+
+    print(f"\n🧾 Analyzing {len(repos)} repositories...")
+    reports = analyze_fleet(repos, args.checkouts, args.cache_dir, args.jobs)
+
+    fleet_report = render_fleet_report(reports)
+    print("\n" + fleet_report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(fleet_report)
+
+    if args.mode == "report":
+        return
+
+    print("✏️ Updating translation issues...")
+    results = update_fleet_issues(repos, reports, args.workers, args.mode == "dry-run")
+
+    print("\n📊 Summary:")
+    for status, icon in [("updated", "✅"), ("unchanged", "⏩"), ("skipped", "🚫"), ("failed", "❌")]:
+        names = [name for name, result in results.items() if result == status]
+        print(f"  {icon} {status.capitalize() + ':':<10} {len(names)}" + (f" ({', '.join(names)})" if names else ""))
+
+    if "failed" in results.values():
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()